@@ -7,7 +7,7 @@ This script listens to multiple MQTT feeds from Adafruit IO and processes:
 
 The data is saved to:
 - Django database (WardReading and PatientVitals models)
-- CSV file for backup/analysis
+- Daily SQLite backup files for analysis
 
 Feeds monitored:
 - Ward temperature
@@ -16,16 +16,34 @@ Feeds monitored:
 - Patient temperature
 """
 
+import atexit
+import logging
 import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
 import django
-import csv
-from paho.mqtt.client import Client
+from paho.mqtt.client import CallbackAPIVersion, Client
 import app_secrets
 
+# INFO by default so the per-message DEBUG lines are never even formatted;
+# set LOGLEVEL=DEBUG to see them
+logging.basicConfig(
+    level=os.environ.get("LOGLEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
 # Setup Django environment
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_monitor.settings')
 django.setup()
 
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
 from data_management.models import WardReading, Ward, Microcontroller, PatientVitals, Patient
 
 # Adafruit IO Credentials
@@ -44,13 +62,75 @@ DEFAULT_HEART_RATE = 70
 DEFAULT_OXYGEN_SATURATION = 98.0
 DEFAULT_NOISE_LEVEL = 0.0
 
-CSV_FILE_PATH = "sensor_data.csv"
+# Feed dispatch - a single dict lookup instead of the if/elif chain
+_FEED_TO_KEY = {
+    WARD_TEMP_FEED: "ward_temperature",
+    WARD_HUMIDITY_FEED: "ward_humidity",
+    PATIENT_TEMPERATURE_FEED: "patient_temperature",
+    LIGHT_INTENSITY_FEED: "light_intensity",
+}
 
-# Make sure the CSV has headers
-if not os.path.exists(CSV_FILE_PATH):
-    with open(CSV_FILE_PATH, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["ward_temperature", "ward_humidity", "patient_temperature", "light_intensity", "timestamp"])
+# Raw-data backup sink: a typed, append-only SQLite file per day instead of
+# an unbounded CSV - no per-message float->str formatting, and old days can
+# be archived or deleted independently
+BACKUP_DIR = Path("sensor_backup")
+BACKUP_DIR.mkdir(exist_ok=True)
+
+BACKUP_FLUSH_ROWS = 64
+BACKUP_FLUSH_INTERVAL_S = 2.0
+
+_backup_conn = None
+_backup_day = None
+_backup_rows = []
+_backup_last_flush = time.monotonic()
+
+
+def _backup_connection():
+    """Return the sink for today's file, rotating at midnight."""
+    global _backup_conn, _backup_day
+    today = date.today()
+    if _backup_conn is None or _backup_day != today:
+        if _backup_conn is not None:
+            _backup_conn.close()
+        # check_same_thread=False: the connection is created on the DB-worker
+        # thread but the atexit flush runs on the main thread. Access is
+        # serialized (the worker is joined before atexit handlers run), the
+        # check would just reject the final flush and lose the buffered rows.
+        _backup_conn = sqlite3.connect(
+            BACKUP_DIR / f"sensor_data_{today.isoformat()}.sqlite3",
+            check_same_thread=False,
+        )
+        _backup_conn.execute("PRAGMA journal_mode=WAL;")
+        _backup_conn.execute("PRAGMA synchronous=NORMAL;")
+        _backup_conn.execute(
+            "CREATE TABLE IF NOT EXISTS readings ("
+            "ward_temperature REAL, ward_humidity REAL, "
+            "patient_temperature REAL, light_intensity REAL, timestamp REAL)"
+        )
+        _backup_day = today
+    return _backup_conn
+
+
+def _flush_backup_rows():
+    """Write buffered backup rows with a single executemany + commit."""
+    global _backup_last_flush
+    if _backup_rows:
+        conn = _backup_connection()
+        conn.executemany("INSERT INTO readings VALUES (?, ?, ?, ?, ?)", _backup_rows)
+        conn.commit()
+        _backup_rows.clear()
+    _backup_last_flush = time.monotonic()
+
+
+def _backup_log_row(row):
+    """Buffer a backup row, flushing the batch periodically."""
+    _backup_rows.append(row)
+    if (len(_backup_rows) >= BACKUP_FLUSH_ROWS or
+        time.monotonic() - _backup_last_flush > BACKUP_FLUSH_INTERVAL_S):
+        _flush_backup_rows()
+
+
+atexit.register(_flush_backup_rows)
 
 # Cache last known values for ward and patient data
 sensor_cache = {
@@ -60,116 +140,238 @@ sensor_cache = {
     "light_intensity": None
 }
 
+# Batching configuration - readings are buffered in memory and written to the
+# database in bulk so each MQTT message doesn't pay a full INSERT round-trip
+BATCH_SIZE = 50
+FLUSH_INTERVAL_S = 2.0
+
+# The buffers are touched from three threads (worker, paho's network thread
+# via on_disconnect, and the main thread via atexit/Ctrl+C), so every access
+# goes through _buf_lock and flushes swap the contents out under the lock
+_ward_buf = []
+_vitals_buf = []
+_buf_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+def _check_target_rows():
+    """Fail fast at startup if the configured Ward/Patient rows don't exist.
+
+    Readings are built with ward_id=/patient_id= directly, so the FK rows
+    are never fetched per message — validate them once here instead.
+    """
+    if not Ward.objects.filter(id=WARD_ID).exists():
+        raise SystemExit(f"✗ Ward with ID {WARD_ID} not found")
+    if not Patient.objects.filter(user_id=PATIENT_ID).exists():
+        raise SystemExit(f"✗ Patient with user_id {PATIENT_ID} not found")
+
+
+def _set_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=WAL;")
+            cursor.execute("PRAGMA synchronous=NORMAL;")
+
+
+def _tune_sqlite():
+    """Switch SQLite to WAL mode so batch commits don't block readers.
+
+    journal_mode=WAL persists in the database file, but synchronous=NORMAL
+    is per-connection - and every thread (notably the DB worker, which does
+    all the writing) opens its own. Hooking connection_created applies the
+    pragmas to each new connection; the main thread's existing one is tuned
+    directly.
+    """
+    if connection.vendor != "sqlite":
+        return
+    connection_created.connect(_set_sqlite_pragmas)
+    _set_sqlite_pragmas(None, connection)
+
+
+def _flush_buffers():
+    """Write any buffered readings to the database in one transaction."""
+    global _last_flush
+    with _buf_lock:
+        ward_rows, _ward_buf[:] = _ward_buf[:], []
+        vitals_rows, _vitals_buf[:] = _vitals_buf[:], []
+        _last_flush = time.monotonic()
+
+    if not ward_rows and not vitals_rows:
+        return
+    # One atomic block -> one commit (and one fsync) per flush instead
+    # of one per bulk_create
+    with transaction.atomic():
+        if ward_rows:
+            WardReading.objects.bulk_create(ward_rows, batch_size=500)
+        if vitals_rows:
+            PatientVitals.objects.bulk_create(vitals_rows, batch_size=500)
+    logger.debug("Flushed %d ward readings and %d patient vitals to database",
+                 len(ward_rows), len(vitals_rows))
+
+
+def _maybe_flush():
+    """Flush when either buffer is full or the flush interval has elapsed."""
+    with _buf_lock:
+        due = (
+            len(_ward_buf) >= BATCH_SIZE
+            or len(_vitals_buf) >= BATCH_SIZE
+            or (time.monotonic() - _last_flush > FLUSH_INTERVAL_S
+                and (_ward_buf or _vitals_buf))
+        )
+    if due:
+        try:
+            _flush_buffers()
+        except Exception:
+            logger.exception("Error flushing buffered readings")
+
+
+atexit.register(_flush_buffers)
+
+# Work queue between the paho network thread and the DB-writer thread.
+# on_message only parses and enqueues so the MQTT socket is never blocked
+# on ORM latency; the worker drains the queue and does the buffered writes.
+_work_q = queue.Queue(maxsize=10000)
+_stop_event = threading.Event()
+_dropped_messages = 0
+
+
+def _db_worker():
+    """Drain the work queue and run the (buffered) database writes.
+
+    Keeps draining after the stop event until the queue is empty, so
+    messages enqueued just before shutdown still reach the database.
+    """
+    while not (_stop_event.is_set() and _work_q.empty()):
+        try:
+            topic, value = _work_q.get(timeout=0.5)
+        except queue.Empty:
+            _maybe_flush()
+            continue
+        try:
+            _process_reading(topic, value)
+        except Exception:
+            logger.exception("Error processing reading from %s", topic)
+        _maybe_flush()
+
 def on_connect(client, userdata, flags, rc):
     if rc == 0:
         print("✓ Connected to Adafruit IO successfully")
-        client.subscribe(WARD_TEMP_FEED)
-        client.subscribe(WARD_HUMIDITY_FEED)
-        client.subscribe(PATIENT_TEMPERATURE_FEED)
-        client.subscribe(LIGHT_INTENSITY_FEED)
+        # QoS 1 so feed values queued while we were reconnecting are delivered
+        client.subscribe(WARD_TEMP_FEED, qos=1)
+        client.subscribe(WARD_HUMIDITY_FEED, qos=1)
+        client.subscribe(PATIENT_TEMPERATURE_FEED, qos=1)
+        client.subscribe(LIGHT_INTENSITY_FEED, qos=1)
         print("✓ Subscribed to all feeds")
     else:
         print(f"✗ Failed to connect to Adafruit IO. Return code: {rc}")
 
 def on_disconnect(client, userdata, rc):
+    # Flush any buffered readings so a disconnect doesn't lose data
+    try:
+        _flush_buffers()
+    except Exception:
+        logger.exception("Error flushing buffers on disconnect")
+
     if rc != 0:
         print("✗ Unexpected disconnection from Adafruit IO")
     else:
         print("✓ Disconnected from Adafruit IO")
 
-def on_message(client, userdata, msg):
-    from datetime import datetime
-    print(f" Received from {msg.topic}: {msg.payload.decode()}")
+def _process_reading(topic, value):
+    """Update the sensor cache and buffer complete readings (worker thread)."""
+    # Update sensor cache based on topic
+    key = _FEED_TO_KEY.get(topic)
+    if key is None:
+        return
+    sensor_cache[key] = value
+    logger.debug("%s: %s", key, value)
+
+    # Save ward readings if we have ward temperature, humidity, and light intensity
+    if (sensor_cache["ward_temperature"] is not None and
+        sensor_cache["ward_humidity"] is not None and
+        sensor_cache["light_intensity"] is not None):
 
-    try:
-        value = float(msg.payload.decode())
-
-        # Update sensor cache based on topic
-        if msg.topic == WARD_TEMP_FEED:
-            sensor_cache["ward_temperature"] = value
-            print(f"  Ward temperature: {value}°C")
-        elif msg.topic == WARD_HUMIDITY_FEED:
-            sensor_cache["ward_humidity"] = value
-            print(f" Ward humidity: {value}%")
-        elif msg.topic == PATIENT_TEMPERATURE_FEED:
-            sensor_cache["patient_temperature"] = value
-            print(f" Patient temperature: {value}°C")
-        elif msg.topic == LIGHT_INTENSITY_FEED:
-            sensor_cache["light_intensity"] = value
-            print(f" Light intensity: {value}")
-
-        # Save ward readings if we have ward temperature, humidity, and light intensity
-        if (sensor_cache["ward_temperature"] is not None and
-            sensor_cache["ward_humidity"] is not None and
-            sensor_cache["light_intensity"] is not None):
-
-            try:
-                ward = Ward.objects.get(id=WARD_ID)
-
-                WardReading.objects.create(
-                    ward=ward,
-                    temperature=sensor_cache["ward_temperature"],
-                    humidity=sensor_cache["ward_humidity"],
-                    noise_level=DEFAULT_NOISE_LEVEL,  # Default value, can be updated when noise sensor is added
-                    light_intensity=sensor_cache["light_intensity"]
-                )
-
-                print(f"Saved ward reading: T={sensor_cache['ward_temperature']}°C, H={sensor_cache['ward_humidity']}%, L={sensor_cache['light_intensity']}")
-
-                # Reset ward-related cache
-                sensor_cache["ward_temperature"] = None
-                sensor_cache["ward_humidity"] = None
-                sensor_cache["light_intensity"] = None
-
-            except Ward.DoesNotExist:
-                print(f"✗ Ward with ID {WARD_ID} not found")
-            except Exception as e:
-                print(f"✗ Error saving ward reading: {e}")
-
-        # Save patient vitals if we have patient temperature
-        if sensor_cache["patient_temperature"] is not None:
-            try:
-                patient = Patient.objects.get(user_id=PATIENT_ID)
-
-                PatientVitals.objects.create(
-                    patient=patient,
-                    temperature=sensor_cache["patient_temperature"],
-                    heart_rate=DEFAULT_HEART_RATE,  # Default value - should come from heart rate sensor
-                    oxygen_saturation=DEFAULT_OXYGEN_SATURATION  # Default value - should come from pulse oximeter
-                )
-
-                print(f"✅ Saved patient vitals: T={sensor_cache['patient_temperature']}°C")
-
-                # Reset patient cache
-                sensor_cache["patient_temperature"] = None
-
-            except Patient.DoesNotExist:
-                print(f"✗ Patient with user_id {PATIENT_ID} not found")
-            except Exception as e:
-                print(f"✗ Error saving patient vitals: {e}")
-
-        # Log to CSV with timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         try:
-            with open(CSV_FILE_PATH, mode='a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([
-                    sensor_cache.get("ward_temperature", ""),
-                    sensor_cache.get("ward_humidity", ""),
-                    sensor_cache.get("patient_temperature", ""),
-                    sensor_cache.get("light_intensity", ""),
-                    timestamp
-                ])
-        except Exception as e:
-            print(f"✗ Error writing to CSV: {e}")
+            reading = WardReading(
+                ward_id=WARD_ID,
+                temperature=sensor_cache["ward_temperature"],
+                humidity=sensor_cache["ward_humidity"],
+                noise_level=DEFAULT_NOISE_LEVEL,  # Default value, can be updated when noise sensor is added
+                light_intensity=sensor_cache["light_intensity"]
+            )
+            with _buf_lock:
+                _ward_buf.append(reading)
+
+            logger.debug("Buffered ward reading: T=%s°C, H=%s%%, L=%s",
+                         sensor_cache["ward_temperature"], sensor_cache["ward_humidity"], sensor_cache["light_intensity"])
+
+            # Reset ward-related cache
+            sensor_cache["ward_temperature"] = None
+            sensor_cache["ward_humidity"] = None
+            sensor_cache["light_intensity"] = None
+
+        except Exception:
+            logger.exception("Error saving ward reading")
+
+    # Save patient vitals if we have patient temperature
+    if sensor_cache["patient_temperature"] is not None:
+        try:
+            vitals = PatientVitals(
+                patient_id=PATIENT_ID,
+                temperature=sensor_cache["patient_temperature"],
+                heart_rate=DEFAULT_HEART_RATE,  # Default value - should come from heart rate sensor
+                oxygen_saturation=DEFAULT_OXYGEN_SATURATION  # Default value - should come from pulse oximeter
+            )
+            with _buf_lock:
+                _vitals_buf.append(vitals)
+
+            logger.debug("Buffered patient vitals: T=%s°C", sensor_cache["patient_temperature"])
+
+            # Reset patient cache
+            sensor_cache["patient_temperature"] = None
+
+        except Exception:
+            logger.exception("Error saving patient vitals")
+
+    # Log to the backup sink with timestamp
+    try:
+        _backup_log_row((
+            sensor_cache["ward_temperature"],
+            sensor_cache["ward_humidity"],
+            sensor_cache["patient_temperature"],
+            sensor_cache["light_intensity"],
+            time.time(),
+        ))
+    except Exception:
+        logger.exception("Error writing to backup sink")
 
+def on_message(client, userdata, msg):
+    # Runs on the paho network thread: parse and enqueue only, so the MQTT
+    # socket keeps being read while the worker thread talks to the database
+    global _dropped_messages
+
+    try:
+        # float() accepts bytes, skipping the intermediate str allocation
+        value = float(msg.payload)
     except ValueError:
-        print(f"✗ Invalid data received: {msg.payload.decode()}")
-    except Exception as e:
-        print(f"✗ Error processing message: {e}")
+        logger.warning("Invalid data received: %s", msg.payload)
+        return
+
+    logger.debug("Received from %s: %s", msg.topic, value)
 
-# Setup MQTT client
-client = Client()
+    try:
+        _work_q.put_nowait((msg.topic, value))
+    except queue.Full:
+        _dropped_messages += 1
+        logger.warning("Work queue full, dropped message from %s (total dropped: %d)", msg.topic, _dropped_messages)
+
+# Setup MQTT client - a stable client id + clean_session=False keeps the
+# broker-side session across restarts so QoS 1 messages aren't lost
+client = Client(
+    CallbackAPIVersion.VERSION1,
+    client_id=f"hm-adafruit-{AIO_USERNAME}",
+    clean_session=False,
+)
+client.reconnect_delay_set(min_delay=1, max_delay=60)
 client.username_pw_set(AIO_USERNAME, AIO_KEY)
 client.on_connect = on_connect
 client.on_disconnect = on_disconnect
@@ -181,16 +383,32 @@ print(f"   - Ward Temperature: {WARD_TEMP_FEED}")
 print(f"   - Ward Humidity: {WARD_HUMIDITY_FEED}")
 print(f"   - Patient Temperature: {PATIENT_TEMPERATURE_FEED}")
 print(f"   - Light Intensity: {LIGHT_INTENSITY_FEED}")
-print(f"Data will be saved to database and {CSV_FILE_PATH}")
+print(f"Data will be saved to database and {BACKUP_DIR}/")
+
+_check_target_rows()
+_tune_sqlite()
+
+# DB writes happen on the worker thread; the network loop runs on its
+# own paho-owned thread so the main thread can shut down cleanly. Started
+# before connecting so the Ctrl+C handler can always join it.
+_worker = threading.Thread(target=_db_worker, daemon=True)
+_worker.start()
 
 # Connect and listen
 try:
     client.connect("io.adafruit.com", 1883, 60)
     print("Listening for sensor data... (Press Ctrl+C to stop)")
-    client.loop_forever()
+
+    client.loop_start()
+    while True:
+        time.sleep(1)
 except KeyboardInterrupt:
     print("\nStopping listener...")
+    client.loop_stop()
     client.disconnect()
+    _stop_event.set()
+    _worker.join(timeout=5)
+    _flush_buffers()
     print("Disconnected successfully")
 except Exception as e:
     print(f"Connection error: {e}")
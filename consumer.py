@@ -1,19 +1,148 @@
 # mqtt_consumer.py
+import atexit
+import logging
 import os
+import queue
+import threading
+import time
 import django
 import paho.mqtt.client as mqtt
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
 # Setup Django environment
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_monitor.settings')
 django.setup()
 
+from django.db import connection, transaction
+from django.db.backends.signals import connection_created
 from data_management.models import WardReading, Ward, PatientVitals, Patient
 
 # Configuration - adjust these based on your setup
 DEFAULT_WARD_ID = 1
 DEFAULT_PATIENT_ID = 2
 
+# A stable client id + clean_session=False keeps the broker-side session
+# (and QoS 1 messages queued during a reconnect) across restarts. Give each
+# extra consumer process its own MQTT_CLIENT_ID; they share the
+# subscription group below so the broker load-balances topics between them.
+MQTT_CLIENT_ID = os.environ.get("MQTT_CLIENT_ID", "hm-consumer-1")
+MQTT_SHARE_GROUP = "hm-consumers"
+MQTT_QOS = 1
+
+# Batching configuration - readings are buffered in memory and written to the
+# database in bulk so each MQTT message doesn't pay a full INSERT round-trip
+BATCH_SIZE = 50
+FLUSH_INTERVAL_S = 2.0
+
+# The buffers are touched from three threads (worker, paho's network thread
+# via on_disconnect, and the main thread via atexit/Ctrl+C), so every access
+# goes through _buf_lock and flushes swap the contents out under the lock
+_ward_buf = []
+_vitals_buf = []
+_buf_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+def _check_target_rows():
+    """Fail fast at startup if the configured Ward/Patient rows don't exist.
+
+    Readings are built with ward_id=/patient_id= directly, so the FK rows
+    are never fetched per message — validate them once here instead.
+    """
+    if not Ward.objects.filter(id=DEFAULT_WARD_ID).exists():
+        raise SystemExit(f"Ward with ID {DEFAULT_WARD_ID} not found. Please create a ward in the admin panel.")
+    if not Patient.objects.filter(user_id=DEFAULT_PATIENT_ID).exists():
+        raise SystemExit(f"Patient with user_id {DEFAULT_PATIENT_ID} not found. Please create a patient in the admin panel.")
+
+
+def _set_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=WAL;")
+            cursor.execute("PRAGMA synchronous=NORMAL;")
+
+
+def _tune_sqlite():
+    """Switch SQLite to WAL mode so batch commits don't block readers.
+
+    journal_mode=WAL persists in the database file, but synchronous=NORMAL
+    is per-connection - and every thread (notably the DB worker, which does
+    all the writing) opens its own. Hooking connection_created applies the
+    pragmas to each new connection; the main thread's existing one is tuned
+    directly.
+    """
+    if connection.vendor != "sqlite":
+        return
+    connection_created.connect(_set_sqlite_pragmas)
+    _set_sqlite_pragmas(None, connection)
+
+
+def _flush_buffers():
+    """Write any buffered readings to the database in one transaction."""
+    global _last_flush
+    with _buf_lock:
+        ward_rows, _ward_buf[:] = _ward_buf[:], []
+        vitals_rows, _vitals_buf[:] = _vitals_buf[:], []
+        _last_flush = time.monotonic()
+
+    if not ward_rows and not vitals_rows:
+        return
+    # One atomic block -> one commit (and one fsync) per flush instead
+    # of one per bulk_create
+    with transaction.atomic():
+        if ward_rows:
+            WardReading.objects.bulk_create(ward_rows, batch_size=500)
+        if vitals_rows:
+            PatientVitals.objects.bulk_create(vitals_rows, batch_size=500)
+    logger.debug("Flushed %d ward readings and %d patient vitals to database",
+                 len(ward_rows), len(vitals_rows))
+
+
+def _maybe_flush():
+    """Flush when either buffer is full or the flush interval has elapsed."""
+    with _buf_lock:
+        due = (
+            len(_ward_buf) >= BATCH_SIZE
+            or len(_vitals_buf) >= BATCH_SIZE
+            or (time.monotonic() - _last_flush > FLUSH_INTERVAL_S
+                and (_ward_buf or _vitals_buf))
+        )
+    if due:
+        try:
+            _flush_buffers()
+        except Exception:
+            logger.exception("Error flushing buffered readings")
+
+
+atexit.register(_flush_buffers)
+
+# Work queue between the paho network thread and the DB-writer thread.
+# on_message only parses and enqueues so the MQTT socket is never blocked
+# on ORM latency; the worker drains the queue and does the buffered writes.
+_work_q = queue.Queue(maxsize=10000)
+_stop_event = threading.Event()
+_dropped_messages = 0
+
+
+def _db_worker():
+    """Drain the work queue and run the (buffered) database writes.
+
+    Keeps draining after the stop event until the queue is empty, so
+    messages enqueued just before shutdown still reach the database.
+    """
+    while not (_stop_event.is_set() and _work_q.empty()):
+        try:
+            topic, value = _work_q.get(timeout=0.5)
+        except queue.Empty:
+            _maybe_flush()
+            continue
+        try:
+            _process_reading(topic, value)
+        except Exception:
+            logger.exception("Error processing reading from %s", topic)
+        _maybe_flush()
+
 # MQTT Topics from Pico
 TOPIC_TEMP_DHT = "ward/temperature_dht"
 TOPIC_HUMID = "ward/humidity"
@@ -23,6 +152,17 @@ TOPIC_SOUND = "ward/sound"
 TOPIC_LIGHT = "ward/light"
 TOPIC_TEMP_LM35 = "ward/temperature_lm35"
 
+# Topic dispatch - a single dict lookup instead of a 7-way if/elif chain
+_TOPIC_TO_KEY = {
+    TOPIC_TEMP_DHT: "ward_temp_dht",
+    TOPIC_TEMP_LM35: "ward_temp_lm35",
+    TOPIC_HUMID: "ward_humidity",
+    TOPIC_SOUND: "ward_sound",
+    TOPIC_LIGHT: "ward_light",
+    TOPIC_SPO2: "patient_spo2",
+    TOPIC_HEART_RATE: "patient_heart_rate",
+}
+
 # Cache to store sensor readings
 sensor_cache = {
     "ward_temp_dht": None,
@@ -51,12 +191,21 @@ def on_connect(client, userdata, flags, rc):
         ]
 
         for topic in topics:
-            client.subscribe(topic)
+            # Shared subscription: messages arrive with the plain topic, the
+            # broker only uses the $share prefix for group load-balancing
+            client.subscribe(f"$share/{MQTT_SHARE_GROUP}/{topic}", qos=MQTT_QOS)
             print(f"✓ Subscribed to: {topic}")
 
     else:
         print(f"Failed to connect to MQTT broker. Return code: {rc}")
 
+def on_disconnect(client, userdata, rc):
+    # Flush any buffered readings so a disconnect doesn't lose data
+    try:
+        _flush_buffers()
+    except Exception:
+        logger.exception("Error flushing buffers on disconnect")
+
 def save_ward_reading():
     """Save a ward reading when we have sufficient ward sensor data"""
     try:
@@ -66,17 +215,18 @@ def save_ward_reading():
         if (ward_temp is not None and
             sensor_cache["ward_humidity"] is not None):
 
-            ward = Ward.objects.get(id=DEFAULT_WARD_ID)
-
-            WardReading.objects.create(
-                ward=ward,
+            reading = WardReading(
+                ward_id=DEFAULT_WARD_ID,
                 temperature=ward_temp,
                 humidity=sensor_cache["ward_humidity"],
                 noise_level=sensor_cache["ward_sound"] or 0.0,  # Default to 0 if no sound data
                 light_intensity=sensor_cache["ward_light"]
             )
+            with _buf_lock:
+                _ward_buf.append(reading)
 
-            print(f"Saved ward reading: T={ward_temp}°C, H={sensor_cache['ward_humidity']}%, Sound={sensor_cache['ward_sound']}, Light={sensor_cache['ward_light']}")
+            logger.debug("Buffered ward reading: T=%s°C, H=%s%%, Sound=%s, Light=%s",
+                         ward_temp, sensor_cache["ward_humidity"], sensor_cache["ward_sound"], sensor_cache["ward_light"])
 
             # Reset ward cache after saving
             sensor_cache["ward_temp_dht"] = None
@@ -85,10 +235,8 @@ def save_ward_reading():
             sensor_cache["ward_sound"] = None
             sensor_cache["ward_light"] = None
 
-    except Ward.DoesNotExist:
-        print(f"Ward with ID {DEFAULT_WARD_ID} not found. Please create a ward in the admin panel.")
-    except Exception as e:
-        print(f"Error saving ward reading: {e}")
+    except Exception:
+        logger.exception("Error buffering ward reading")
 
 def save_patient_vitals():
     """Save patient vitals when we have sufficient patient sensor data"""
@@ -96,75 +244,62 @@ def save_patient_vitals():
         if (sensor_cache["patient_spo2"] is not None and
             sensor_cache["patient_heart_rate"] is not None):
 
-            patient = Patient.objects.get(user_id=DEFAULT_PATIENT_ID)
-
             # Use ward temperature as patient temperature if available
             patient_temp = sensor_cache["ward_temp_dht"] or sensor_cache["ward_temp_lm35"] or 36.5  # Default body temp
 
-            PatientVitals.objects.create(
-                patient=patient,
+            vitals = PatientVitals(
+                patient_id=DEFAULT_PATIENT_ID,
                 temperature=patient_temp,
                 heart_rate=int(sensor_cache["patient_heart_rate"]),
                 oxygen_saturation=sensor_cache["patient_spo2"]
             )
+            with _buf_lock:
+                _vitals_buf.append(vitals)
 
-            print(f"Saved patient vitals: T={patient_temp}°C, HR={sensor_cache['patient_heart_rate']}bpm, SpO2={sensor_cache['patient_spo2']}%")
+            logger.debug("Buffered patient vitals: T=%s°C, HR=%sbpm, SpO2=%s%%",
+                         patient_temp, sensor_cache["patient_heart_rate"], sensor_cache["patient_spo2"])
 
             # Reset patient cache after saving
             sensor_cache["patient_spo2"] = None
             sensor_cache["patient_heart_rate"] = None
 
-    except Patient.DoesNotExist:
-        print(f"✗ Patient with user_id {DEFAULT_PATIENT_ID} not found. Please create a patient in the admin panel.")
-    except Exception as e:
-        print(f"✗ Error saving patient vitals: {e}")
-
-def on_message(client, userdata, msg):
-    topic = msg.topic
-    payload = msg.payload.decode()
-    print(f"Received: {topic} => {payload}")
-
-    try:
-        value = float(payload)
-        sensor_cache["timestamp"] = datetime.now()
-
-        # Process different sensor topics
-        if topic == TOPIC_TEMP_DHT:
-            sensor_cache["ward_temp_dht"] = value
-            print(f"DHT Temperature: {value}°C")
-
-        elif topic == TOPIC_TEMP_LM35:
-            sensor_cache["ward_temp_lm35"] = value
-            print(f"LM35 Temperature: {value}°C")
+    except Exception:
+        logger.exception("Error buffering patient vitals")
 
-        elif topic == TOPIC_HUMID:
-            sensor_cache["ward_humidity"] = value
-            print(f"Humidity: {value}%")
+def _process_reading(topic, value):
+    """Update the sensor cache and buffer complete readings (worker thread)."""
+    key = _TOPIC_TO_KEY.get(topic)
+    if key is None:
+        return
 
-        elif topic == TOPIC_SOUND:
-            sensor_cache["ward_sound"] = value
-            print(f"Sound Level: {value} dB")
+    sensor_cache["timestamp"] = datetime.now()
+    sensor_cache[key] = value
+    logger.debug("%s: %s", key, value)
 
-        elif topic == TOPIC_LIGHT:
-            sensor_cache["ward_light"] = value
-            print(f"Light Intensity: {value}")
+    # Try to save complete readings
+    save_ward_reading()
+    save_patient_vitals()
 
-        elif topic == TOPIC_SPO2:
-            sensor_cache["patient_spo2"] = value
-            print(f"Blood Oxygen (SpO2): {value}%")
+def on_message(client, userdata, msg):
+    # Runs on the paho network thread: parse and enqueue only, so the MQTT
+    # socket keeps being read while the worker thread talks to the database
+    global _dropped_messages
+    topic = msg.topic
 
-        elif topic == TOPIC_HEART_RATE:
-            sensor_cache["patient_heart_rate"] = value
-            print(f"Heart Rate: {value} bpm")
+    try:
+        # float() accepts bytes, skipping the intermediate str allocation
+        value = float(msg.payload)
+    except ValueError:
+        logger.warning("Invalid data received from %s: %s", topic, msg.payload)
+        return
 
-        # Try to save complete readings
-        save_ward_reading()
-        save_patient_vitals()
+    logger.debug("Received: %s => %s", topic, value)
 
-    except ValueError:
-        print(f"✗ Invalid data received from {topic}: {payload}")
-    except Exception as e:
-        print(f"✗ Error processing message from {topic}: {e}")
+    try:
+        _work_q.put_nowait((topic, value))
+    except queue.Full:
+        _dropped_messages += 1
+        logger.warning("Work queue full, dropped message from %s (total dropped: %d)", topic, _dropped_messages)
 
 def print_startup_info():
     """Print startup information and configuration"""
@@ -192,22 +327,50 @@ def print_startup_info():
     print("=" * 60)
 
 def main():
+    # INFO by default so the per-message DEBUG lines are never even formatted;
+    # set LOGLEVEL=DEBUG to see them
+    logging.basicConfig(
+        level=os.environ.get("LOGLEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
     print_startup_info()
+    _check_target_rows()
+    _tune_sqlite()
+
+    # Start the DB-writer thread before connecting so the KeyboardInterrupt
+    # handler can always join it, even if Ctrl+C lands mid-connect
+    worker = threading.Thread(target=_db_worker, daemon=True)
+    worker.start()
 
     try:
-        client = mqtt.Client()
+        client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION1,
+            client_id=MQTT_CLIENT_ID,
+            clean_session=False,
+        )
+        client.reconnect_delay_set(min_delay=1, max_delay=60)
         client.on_connect = on_connect
+        client.on_disconnect = on_disconnect
         client.on_message = on_message
 
         # Connect to local MQTT broker (Mosquitto)
         client.connect("127.0.0.1", 1883, 60)
 
+        # The network loop runs on its own paho-owned thread so the main
+        # thread can shut down cleanly
         print(" Starting MQTT loop...")
-        client.loop_forever()
+        client.loop_start()
+        while True:
+            time.sleep(1)
 
     except KeyboardInterrupt:
         print("\n  Stopping MQTT consumer...")
+        client.loop_stop()
         client.disconnect()
+        _stop_event.set()
+        worker.join(timeout=5)
+        _flush_buffers()
         print(" Disconnnected via KeyboardInterrupt")
     except Exception as e:
         print(f"❌ Connection error: {e}")
@@ -2,7 +2,7 @@ from django.contrib import admin
 # from django.core.exceptions import ValidationError
 from django.forms import ModelForm
 from .models import Microcontroller, Ward, Bed, Doctor, Patient, WardReading, PatientVitals
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser
 # from django.utils.text import slugify
@@ -25,19 +25,21 @@ class BedAdminForm(ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        allowed_microcontrollers = Microcontroller.objects.filter(assigned_bed__isnull=True)
         if self.instance.pk:
-            current_microcontroller = self.instance.microcontroller
-            allowed_microcontrollers = Microcontroller.objects.filter(
-                Q(assigned_bed__isnull=True),
+            allowed_microcontrollers = allowed_microcontrollers.filter(
                 Q(assigned_ward__isnull=True) | Q(ward=self.instance.ward)
-            ) | Microcontroller.objects.filter(pk=current_microcontroller.pk if current_microcontroller else None)
-        else:
-            allowed_microcontrollers = Microcontroller.objects.filter(
-                assigned_bed__isnull=True,
-                assigned_ward__isnull=True
             )
+            # Keep the currently assigned microcontroller selectable; only
+            # union when one is actually set so no pk=NULL branch is emitted
+            if self.instance.microcontroller_id:
+                allowed_microcontrollers = allowed_microcontrollers | Microcontroller.objects.filter(
+                    pk=self.instance.microcontroller_id
+                )
+        else:
+            allowed_microcontrollers = allowed_microcontrollers.filter(assigned_ward__isnull=True)
 
-        self.fields['microcontroller'].queryset = allowed_microcontrollers
+        self.fields['microcontroller'].queryset = allowed_microcontrollers.distinct()
 
 
 class WardAdmin(admin.ModelAdmin):
@@ -64,6 +66,7 @@ class BedAdmin(admin.ModelAdmin):
 
 class MicrocontrollerAdmin(admin.ModelAdmin):
     list_display = ('identifier', 'name', 'ward', 'bed')
+    list_select_related = ('ward', 'assigned_bed__ward')
     exclude = ('identifier',)
     # prepopulated_fields = {"identifier": ("name",)}  # will fill initially but you override in clean
 
@@ -76,15 +79,16 @@ class PatientAdminForm(ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        from .models import Bed, Patient
-        assigned_bed_pks = Patient.objects.exclude(pk=self.instance.pk).values_list('bed_id', flat=True)
-        if self.instance.pk and self.instance.bed:
-            allowed_beds = Bed.objects.filter(pk=self.instance.bed.pk) | Bed.objects.exclude(pk__in=assigned_bed_pks)
-        else:
-            allowed_beds = Bed.objects.exclude(pk__in=assigned_bed_pks)
+        # A bed is available when no *other* patient occupies it - expressed
+        # as a NOT EXISTS subquery so the other patients' bed ids are never
+        # pulled into Python
+        other_assignments = Patient.objects.exclude(pk=self.instance.pk).filter(bed=OuterRef('pk'))
+        allowed_beds = Bed.objects.annotate(_taken=Exists(other_assignments)).filter(_taken=False)
+        if self.instance.pk and self.instance.bed_id:
+            allowed_beds = allowed_beds | Bed.objects.filter(pk=self.instance.bed_id)
         # Only filter by ward if ward is set on the instance
         if getattr(self.instance, 'ward_id', None):
-            allowed_beds = allowed_beds.filter(ward=self.instance.ward)
+            allowed_beds = allowed_beds.filter(ward_id=self.instance.ward_id)
         self.fields['bed'].queryset = allowed_beds.distinct()
 
 
@@ -95,6 +99,13 @@ class PatientAdmin(admin.ModelAdmin):
     autocomplete_fields = ['user']
     list_filter = ['ward']
 
+    def get_queryset(self, request):
+        # Join everything list_display touches so the changelist renders
+        # without one SELECT per row
+        return super().get_queryset(request).select_related(
+            'user', 'ward', 'bed__ward', 'bed__microcontroller'
+        )
+
     def get_username(self, obj):
         return obj.user.username
     get_username.short_description = 'Name'
@@ -105,15 +116,24 @@ class PatientAdmin(admin.ModelAdmin):
     get_microcontroller.short_description = 'Microcontroller'
     get_microcontroller.admin_order_field = 'bed__microcontroller__identifier'
 
+    def save_model(self, request, obj, form, change):
+        obj.full_clean()
+        super().save_model(request, obj, form, change)
+
 
 class DoctorAdmin(admin.ModelAdmin):
     list_display = ['get_username', 'specialization']
     search_fields = ['user__username', 'specialization']
+    list_select_related = ['user']
 
     def get_username(self, obj):
         return obj.user.username
     get_username.short_description = 'Name'
 
+    def save_model(self, request, obj, form, change):
+        obj.full_clean()
+        super().save_model(request, obj, form, change)
+
 
 class WardReadingAdmin(admin.ModelAdmin):
     list_display = ['ward', 'temperature', 'humidity', 'noise_level', 'light_intensity']
@@ -121,12 +141,21 @@ class WardReadingAdmin(admin.ModelAdmin):
     search_fields =["ward__name"]
     ordering = ["-timestamp"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('ward')
+
 class PatientVitalsAdmin(admin.ModelAdmin):
     list_display = ["patient", "temperature", "heart_rate", "oxygen_saturation", "timestamp"]
     list_filter = ["patient"]
     search_fields= ["patient__user__username"]
     ordering = ["-timestamp"]
 
+    def get_queryset(self, request):
+        # Patient.__str__ walks user, ward and bed, so join them up front
+        return super().get_queryset(request).select_related(
+            'patient__user', 'patient__ward', 'patient__bed'
+        )
+
 
 admin.site.register(Microcontroller, MicrocontrollerAdmin)
 admin.site.register(Ward, WardAdmin)
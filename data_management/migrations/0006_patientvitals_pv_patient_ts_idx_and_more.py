@@ -0,0 +1,21 @@
+# Generated by Django 6.1 on 2026-08-27 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0005_alter_customuser_email'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='patientvitals',
+            index=models.Index(fields=['patient', '-timestamp'], name='pv_patient_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wardreading',
+            index=models.Index(fields=['ward', '-timestamp'], name='wr_ward_ts_idx'),
+        ),
+    ]
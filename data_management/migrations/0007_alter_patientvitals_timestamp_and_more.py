@@ -0,0 +1,23 @@
+# Generated by Django 6.1 on 2026-08-27 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_management', '0006_patientvitals_pv_patient_ts_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='patientvitals',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='wardreading',
+            name='timestamp',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
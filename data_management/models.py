@@ -1,8 +1,24 @@
-from django.db import models
+import re
+
+from django.db import connection, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import AbstractUser
 from django.utils.text import slugify
 
+
+class ValidatedSaveMixin:
+    """
+    Opt-in full_clean() for programmatic callers. Model.save() no longer
+    validates implicitly: the admin validates via ModelAdmin.save_model, and
+    the MQTT ingest path must not pay the extra validation queries per row.
+    """
+    def validated_save(self, *args, **kwargs):
+        self.full_clean()
+        self.save(*args, **kwargs)
+
+
 class Microcontroller(models.Model):
     name = models.CharField(max_length=100)
     identifier = models.SlugField(max_length=100, unique=True, blank=True)  # Allow blank to generate in save
@@ -27,7 +43,14 @@ class Microcontroller(models.Model):
     def save(self, *args, **kwargs):
         if not self.identifier:
             base_slug = slugify(self.name)
-            existing_slugs = Microcontroller.objects.filter(identifier__startswith=base_slug).values_list('identifier', flat=True)
+            # Only fetch identifiers that could actually collide (the base
+            # slug or base-<n>), not every slug sharing the prefix, and pick
+            # the next free suffix in a single pass
+            existing_slugs = set(
+                Microcontroller.objects
+                .filter(identifier__regex=rf'^{re.escape(base_slug)}(-\d+)?$')
+                .values_list('identifier', flat=True)
+            )
 
             if base_slug not in existing_slugs:
                 self.identifier = base_slug
@@ -44,12 +67,11 @@ class Microcontroller(models.Model):
         """
         Returns the bed this microcontroller is assigned to, if any.
         """
-        try:
-            return self.assigned_bed
-        except (AttributeError, Bed.DoesNotExist):
-            return None
+        # RelatedObjectDoesNotExist subclasses AttributeError, so getattr
+        # covers the missing-bed case without exception-driven control flow
+        return getattr(self, 'assigned_bed', None)
 
-class Ward(models.Model):
+class Ward(ValidatedSaveMixin, models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=60, unique=True)
     description = models.TextField(max_length=500, null=True, blank=True)
@@ -65,19 +87,19 @@ class Ward(models.Model):
     def __str__(self):
         return f"Ward {self.name} ({self.location})" if self.location else str(self.name)
 
+    def latest_reading(self):
+        """Returns the most recent WardReading for this ward, or None."""
+        return self.wardreading_set.order_by('-timestamp').first()
+
 
 
     def clean(self):
         if self.microcontroller:
             if Bed.objects.filter(microcontroller=self.microcontroller).exists():
                 raise ValidationError(f"Microcontroller {self.microcontroller} is already assigned to a bed.")
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
 
 
-
-class Bed(models.Model):
+class Bed(ValidatedSaveMixin, models.Model):
     ward = models.ForeignKey(Ward, on_delete=models.CASCADE, related_name="beds")
     bed_number = models.IntegerField()
     microcontroller = models.OneToOneField(
@@ -99,11 +121,6 @@ class Bed(models.Model):
             if self.microcontroller.ward and self.microcontroller.ward != self.ward:
                 raise ValidationError(f"Microcontroller {self.microcontroller} is assigned to {self.microcontroller.ward}, not to this bed's ward {self.ward}.")
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
-
-
     def __str__(self):
         return f"{self.bed_number} in {self.ward}"
 
@@ -118,7 +135,7 @@ class CustomUser(AbstractUser):
         return self.username
 
 
-class Patient(models.Model):
+class Patient(ValidatedSaveMixin, models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True)
     ward = models.ForeignKey(Ward, on_delete=models.CASCADE, related_name='patients')
     bed = models.OneToOneField(Bed, on_delete=models.SET_NULL, related_name="patient", null=True, blank=True)
@@ -137,31 +154,45 @@ class Patient(models.Model):
         if self.bed and self.bed.ward != self.ward:
             raise ValidationError(f"Assigned bed {self.bed} belongs to ward {self.bed.ward}, not {self.ward}.")
 
-    def save(self, *args, **kwargs):
-        self.full_clean()  # This calls the clean() method and field validation
-        super().save(*args, **kwargs)
-
     def __str__(self):
-        name = self.user.get_full_name() if self.user and hasattr(self.user, "get_full_name") else (self.user.username if self.user and hasattr(self.user, "username") else "")
-        if self.bed and hasattr(self.bed, "bed_number"):
-            return f"{name} - {self.ward} Bed: {self.bed.bed_number}"
+        # user is a non-nullable OneToOneField, so no hasattr dance needed
+        name = self.user.get_full_name() or self.user.username
+        bed = self.bed
+        if bed:
+            return f"{name} - {self.ward} Bed: {bed.bed_number}"
         return f"{name} - {self.ward} (No Bed Assigned)"
 
 
 
-class Doctor(models.Model):
+class Doctor(ValidatedSaveMixin, models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True)
     specialization = models.CharField(max_length=100, blank=True)
     phone = models.CharField(max_length=20, blank=True)
     patients = models.ManyToManyField('Patient', related_name='doctors', blank=True)
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
-
     def __str__(self):
-        name = self.user.get_full_name() if self.user and hasattr(self.user, "get_full_name") else (self.user.username if self.user and hasattr(self.user, "username") else "")
-        return f"Dr. {name}"
+        return f"Dr. {self.user.get_full_name() or self.user.username}"
+
+
+class WardReadingQuerySet(models.QuerySet):
+    def latest_per_ward(self):
+        """
+        Returns the newest reading for every ward in a single window-function
+        query, instead of one ORDER BY ... LIMIT 1 query per ward.
+
+        On PostgreSQL this uses DISTINCT ON, which walks the
+        (ward, -timestamp) index directly; the window function is the
+        portable fallback for SQLite.
+        """
+        if connection.vendor == 'postgresql':
+            return self.order_by('ward_id', '-timestamp').distinct('ward_id')
+        return self.annotate(
+            _row=Window(
+                expression=RowNumber(),
+                partition_by=[F('ward_id')],
+                order_by=F('timestamp').desc(),
+            )
+        ).filter(_row=1)
 
 
 class WardReading(models.Model):
@@ -170,26 +201,56 @@ class WardReading(models.Model):
     humidity = models.FloatField()
     noise_level = models.FloatField()
     light_intensity = models.FloatField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = WardReadingQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "Ward Readings"
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['ward', '-timestamp'], name='wr_ward_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.ward} {self.timestamp}"
 
 
+class PatientVitalsQuerySet(models.QuerySet):
+    def latest_per_patient(self):
+        """
+        Returns the newest vitals row for every patient in a single
+        window-function query, instead of one query per patient.
+
+        Same vendor split as WardReadingQuerySet.latest_per_ward: DISTINCT ON
+        for PostgreSQL, window function elsewhere.
+        """
+        if connection.vendor == 'postgresql':
+            return self.order_by('patient_id', '-timestamp').distinct('patient_id')
+        return self.annotate(
+            _row=Window(
+                expression=RowNumber(),
+                partition_by=[F('patient_id')],
+                order_by=F('timestamp').desc(),
+            )
+        ).filter(_row=1)
+
+
 class PatientVitals(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     temperature = models.FloatField()
     heart_rate = models.IntegerField()
     oxygen_saturation = models.FloatField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = PatientVitalsQuerySet.as_manager()
 
     class Meta:
         verbose_name_plural = "Patient Vitals"
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['patient', '-timestamp'], name='pv_patient_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.patient} @ {self.timestamp}"
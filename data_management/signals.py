@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Ward
+
+
+@receiver(pre_save, sender=Ward)
+def remember_old_ward_slug(sender, instance, **kwargs):
+    """Stash the currently stored slug so a slug edit can purge both keys."""
+    if instance.pk:
+        instance._old_slug = (
+            Ward.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Ward)
+def invalidate_ward_cache(sender, instance, **kwargs):
+    """Drop the cached slug lookup whenever a ward changes or is removed.
+
+    When the slug itself was edited, the entry cached under the previous
+    slug is deleted too - otherwise the old URL would keep serving the
+    pre-edit ward until its TTL expired.
+    """
+    cache.delete(f'ward:{instance.slug}')
+    old_slug = getattr(instance, '_old_slug', None)
+    if old_slug and old_slug != instance.slug:
+        cache.delete(f'ward:{old_slug}')
@@ -1,60 +1,129 @@
 from django.shortcuts import get_object_or_404, render
 from .models import Ward, Patient, Doctor, Microcontroller, Bed, WardReading, PatientVitals
-from django.db.models import Max
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max, Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 import json
 from django.contrib.auth.decorators import login_required
 
+# orjson encodes float-heavy lists several times faster than stdlib json;
+# fall back to the stdlib so the app still runs without it
+try:
+    import orjson
+
+    def _json_dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _json_dumps = json.dumps
+
+# TTLs for the HTMX polling endpoints - short enough to track the MQTT
+# write cadence, long enough that polls between sensor updates hit the cache
+STATS_CACHE_TTL = 15
+WARD_CONDITIONS_CACHE_TTL = 10
+
+# Wards change rarely; cached slug lookups are invalidated by the
+# post_save/post_delete signal in signals.py
+WARD_CACHE_TTL = 3600
+
+
+def get_ward_cached(ward_slug):
+    """Ward-by-slug lookup backed by the cache; 404s are never cached."""
+    key = f'ward:{ward_slug}'
+    ward = cache.get(key)
+    if ward is None:
+        ward = get_object_or_404(Ward, slug=ward_slug)
+        cache.set(key, ward, WARD_CACHE_TTL)
+    return ward
+
 
 def get_dashboard_stats():
-    return {
-        'ward_count': Ward.objects.count(),
-        'patient_count': Patient.objects.count(),
-        'doctor_count': Doctor.objects.count(),
-        'bed_count': Bed.objects.count(),
-        'microcontroller_count': Microcontroller.objects.count(),
+    # One round-trip with five scalar subqueries instead of five separate
+    # COUNT(*) queries; the counts span different models, so this can't be
+    # expressed as a single ORM aggregate
+    tables = {
+        'ward_count': Ward._meta.db_table,
+        'patient_count': Patient._meta.db_table,
+        'doctor_count': Doctor._meta.db_table,
+        'bed_count': Bed._meta.db_table,
+        'microcontroller_count': Microcontroller._meta.db_table,
     }
+    selects = ', '.join(f'(SELECT COUNT(*) FROM "{table}")' for table in tables.values())
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT {selects}')
+        row = cursor.fetchone()
+    return dict(zip(tables, row))
 
 
 def get_latest_ward_conditions():
-    latest_per_ward = (
-        WardReading.objects.values('ward')
-        .annotate(latest=Max('timestamp'))
+    # Single window-function query instead of one re-filter query per ward;
+    # select_related so templates can read condition.ward.name without
+    # another lookup
+    return list(WardReading.objects.latest_per_ward().select_related('ward'))
+
+def get_dashboard_stats_cached():
+    return cache.get_or_set('dash:stats', get_dashboard_stats, STATS_CACHE_TTL)
+
+
+def get_latest_ward_conditions_cached():
+    return cache.get_or_set('dash:ward_cond', get_latest_ward_conditions, WARD_CONDITIONS_CACHE_TTL)
+
+
+def _build_chart_payload():
+    # One values_list query with NULL-coalescing pushed into SQL, unpacked
+    # column-wise - no model instances or per-field Python branching
+    rows = list(
+        WardReading.objects.latest_per_ward()
+        .annotate(
+            _temp=Coalesce('temperature', Value(0.0)),
+            _hum=Coalesce('humidity', Value(0.0)),
+            _noise=Coalesce('noise_level', Value(0.0)),
+            _light=Coalesce('light_intensity', Value(0.0)),
+        )
+        .values_list('ward__name', '_temp', '_hum', '_noise', '_light')
     )
-    # Build a list of latest WardCondition objects for each ward
-    latest_conditions = [
-        WardReading.objects.filter(ward=entry['ward'], timestamp=entry['latest']).first()
-        for entry in latest_per_ward
-    ]
-    return latest_conditions
+    if rows:
+        wards, temperature, humidity, noise, light_intensity = map(list, zip(*rows))
+    else:
+        wards = temperature = humidity = noise = light_intensity = []
+
+    data = {
+        'wards': wards,
+        'temperature': temperature,
+        'humidity': humidity,
+        'noise': noise,
+        'light_intensity': light_intensity,
+    }
+    return {
+        # Per-series JSON strings for template embedding
+        'context': {f'chart_{key}': _json_dumps(value) for key, value in data.items()},
+        # One serialized blob for the JSON endpoint, sent as-is
+        'json': _json_dumps(data),
+    }
+
+
+def get_chart_payload():
+    # Key the cached payload on the newest reading's timestamp: identical
+    # data skips both the window query and the serialization, and any new
+    # reading changes the key so stale entries are never served.
+    # Max(timestamp) is an index probe thanks to db_index on the column.
+    version = WardReading.objects.aggregate(Max('timestamp'))['timestamp__max']
+    key = f"chart:{version.timestamp() if version else 0}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = _build_chart_payload()
+        cache.set(key, payload, 60)
+    return payload
+
 
 def get_chart_data():
-    latest_conditions = get_latest_ward_conditions()
-    wards  = []
-    temperature =[]
-    humidity = []
-    noise = []
-    light_intensity = []
-
-    for condition in latest_conditions:
-        if condition:  # Check if condition is not None
-            wards.append(condition.ward.name)
-            temperature.append(float(condition.temperature) if condition.temperature else 0)
-            humidity.append(float(condition.humidity) if condition.humidity else 0)
-            noise.append(float(condition.noise_level) if condition.noise_level else 0)
-            light_intensity.append(float(condition.light_intensity) if condition.light_intensity else 0)
-    return  {
-        'chart_wards': json.dumps(wards),
-        'chart_temperature': json.dumps(temperature),
-        'chart_humidity': json.dumps(humidity),
-        'chart_noise': json.dumps(noise),
-        'chart_light_intensity': json.dumps(light_intensity),
-    }
+    return get_chart_payload()['context']
 @login_required
 def dashboard(request):
-    stats= get_dashboard_stats()
-    latest_conditions = get_latest_ward_conditions()
+    stats= get_dashboard_stats_cached()
+    latest_conditions = get_latest_ward_conditions_cached()
     comparison_chart_data = get_chart_data()
     context = {
         'ward_conditions': latest_conditions,
@@ -74,29 +143,22 @@ def dashboard_charts(request):
     return render(request, "data_management/snippets/ward-comparison.html", context)
 
 def dashboard_charts_json(request):
-    comparison_chart_data = get_chart_data()
-    return JsonResponse({
-        'wards': json.loads(comparison_chart_data['chart_wards']),
-        'temperature': json.loads(comparison_chart_data['chart_temperature']),
-        'humidity': json.loads(comparison_chart_data['chart_humidity']),
-        'noise': json.loads(comparison_chart_data['chart_noise']),
-        'light_intensity': json.loads(comparison_chart_data['chart_light_intensity']),
-    })
+    # Already serialized in get_chart_payload - no dumps/loads round-trip
+    return HttpResponse(get_chart_payload()['json'], content_type='application/json')
 
 def get_patient_vitals_data(ward):
     """
-    Returns a list of the latest PatientVitals for each patient in the given ward.
-    If a patient has no vitals, returns a dict with patient info and None for vitals.
+    Returns a list of the latest PatientVitals for each patient in the given
+    ward, fetched with a single window-function query instead of one query
+    per patient. Patients with no vitals simply have no row.
     """
-    patients_in_ward = Patient.objects.filter(bed__ward=ward).select_related('bed')
-    patient_vitals = []
-    for patient in patients_in_ward:
-        latest_vital = PatientVitals.objects.filter(patient=patient).order_by('-timestamp').first()
-        if latest_vital:
-            patient_vitals.append(latest_vital)
-    return patient_vitals
+    return list(
+        PatientVitals.objects.filter(patient__bed__ward=ward)
+        .latest_per_patient()
+        .select_related('patient__user', 'patient__ward', 'patient__bed')
+    )
 def ward_details(request, ward_slug):
-    ward = get_object_or_404(Ward, slug=ward_slug)
+    ward = get_ward_cached(ward_slug)
     latest_condition = WardReading.objects.filter(ward=ward).order_by('-timestamp').first()
     patient_vitals = get_patient_vitals_data(ward)
 
@@ -114,7 +176,7 @@ def ward_details(request, ward_slug):
 
 
 def htmx_dashboard_stats(request):
-    stats = get_dashboard_stats()
+    stats = get_dashboard_stats_cached()
     context = {
         **stats,
     }
@@ -122,7 +184,7 @@ def htmx_dashboard_stats(request):
 
 
 def htmx_ward_conditions(request):
-    latest_condition = get_latest_ward_conditions()
+    latest_condition = get_latest_ward_conditions_cached()
     context = {
         'ward_conditions': latest_condition,
     }
@@ -133,7 +195,7 @@ def htmx_ward_patient_vitals(request, ward_slug):
     """
     HTMX endpoint to return patient vitals for a specific ward
     """
-    ward = get_object_or_404(Ward, slug=ward_slug)
+    ward = get_ward_cached(ward_slug)
     patient_vitals = get_patient_vitals_data(ward)
 
     context = {
@@ -148,7 +210,7 @@ def htmx_ward_status(request, ward_slug):
     """
     HTMX endpoint to return ward status (temperature, humidity, noise, light)
     """
-    ward = get_object_or_404(Ward, slug=ward_slug)
+    ward = get_ward_cached(ward_slug)
     latest_condition = WardReading.objects.filter(ward=ward).order_by('-timestamp').first()
 
     context = {
@@ -159,36 +221,41 @@ def htmx_ward_status(request, ward_slug):
     return render(request, 'data_management/snippets/ward-status.html', context)
 
 
-def ward_chart_data(request, ward_slug):
-    """
-    Returns historical temperature, humidity, and noise level data for a ward as JSON for Chart.js
-    """
-    ward = get_object_or_404(Ward, slug=ward_slug)
-
-    # Get the last 24 hours of data (or last 20 readings if less than 24 hours)
-    ward_readings = WardReading.objects.filter(ward=ward).order_by('-timestamp')[:20]
-    ward_readings = list(reversed(ward_readings))  # Reverse to chronological order
+def _build_ward_chart_json(ward):
+    """Serialize the last 20 readings of a ward as the Chart.js payload."""
+    # Get the last 24 hours of data (or last 20 readings if less than 24 hours),
+    # re-sorted to chronological order by the database instead of in Python.
+    # NULL-to-0 coercion happens in SQL and the loop unpacks plain tuples,
+    # so no model instantiation or descriptor access per field
+    recent_ids = WardReading.objects.filter(ward=ward).order_by('-timestamp').values_list('id', flat=True)[:20]
+    rows = (
+        WardReading.objects.filter(id__in=list(recent_ids))
+        .order_by('timestamp')
+        .annotate(
+            _temp=Coalesce('temperature', Value(0.0)),
+            _hum=Coalesce('humidity', Value(0.0)),
+            _noise=Coalesce('noise_level', Value(0.0)),
+            _light=Coalesce('light_intensity', Value(0.0)),
+        )
+        .values_list('timestamp', '_temp', '_hum', '_noise', '_light')
+    )
 
     # Prepare data for Chart.js
     labels = []
     temperature_data = []
     humidity_data = []
     noise_data = []
+    light_intensity_data = []
 
-    for reading in ward_readings:
+    for ts, temp, hum, noise, light in rows:
         # Convert UTC timestamp to local timezone before formatting
-        local_time = timezone.localtime(reading.timestamp)
-        labels.append(local_time.strftime('%H:%M'))
-        temperature_data.append(float(reading.temperature) if reading.temperature else 0)
-        humidity_data.append(float(reading.humidity) if reading.humidity else 0)
-        noise_data.append(float(reading.noise_level) if reading.noise_level else 0)
-
-    # Prepare light intensity data
-    light_intensity_data = []
-    for reading in ward_readings:
-        light_intensity_data.append(float(reading.light_intensity) if reading.light_intensity else 0)
+        labels.append(timezone.localtime(ts).strftime('%H:%M'))
+        temperature_data.append(temp)
+        humidity_data.append(hum)
+        noise_data.append(noise)
+        light_intensity_data.append(light)
 
-    return JsonResponse({
+    return _json_dumps({
         'labels': labels,
         'temperature': temperature_data,
         'humidity': humidity_data,
@@ -197,6 +264,25 @@ def ward_chart_data(request, ward_slug):
         'ward_name': ward.name
     })
 
+
+def ward_chart_data(request, ward_slug):
+    """
+    Returns historical temperature, humidity, and noise level data for a ward as JSON for Chart.js
+    """
+    ward = get_ward_cached(ward_slug)
+
+    # Cache the serialized payload keyed on the ward's newest timestamp
+    # (a cheap probe on the (ward, -timestamp) index); the dashboard polls
+    # this endpoint far more often than readings arrive, and a new reading
+    # changes the key so staleness isn't possible
+    last_ts = WardReading.objects.filter(ward=ward).aggregate(Max('timestamp'))['timestamp__max']
+    key = f"ward_chart:{ward.id}:{last_ts.timestamp() if last_ts else 0}"
+    payload = cache.get(key)
+    if payload is None:
+        payload = _build_ward_chart_json(ward)
+        cache.set(key, payload, 60)
+    return HttpResponse(payload, content_type='application/json')
+
 def patient_details(request, patient_id):
     """
     Patient detail view showing vitals and charts
@@ -231,9 +317,20 @@ def patient_chart_data(request, patient_id):
     """
     patient = get_object_or_404(Patient, pk=patient_id)
 
-    # Get the last 20 readings for the patient
-    patient_vitals = PatientVitals.objects.filter(patient=patient).order_by('-timestamp')[:20]
-    patient_vitals = list(reversed(patient_vitals))  # Reverse to chronological order
+    # Get the last 20 readings for the patient, re-sorted to chronological
+    # order by the database instead of in Python; tuples with SQL-side
+    # NULL-to-0 coercion, same as the ward chart
+    recent_ids = PatientVitals.objects.filter(patient=patient).order_by('-timestamp').values_list('id', flat=True)[:20]
+    rows = (
+        PatientVitals.objects.filter(id__in=list(recent_ids))
+        .order_by('timestamp')
+        .annotate(
+            _hr=Coalesce('heart_rate', Value(0)),
+            _temp=Coalesce('temperature', Value(0.0)),
+            _spo2=Coalesce('oxygen_saturation', Value(0.0)),
+        )
+        .values_list('timestamp', '_hr', '_temp', '_spo2')
+    )
 
     # Prepare data for Chart.js
     labels = []
@@ -241,13 +338,12 @@ def patient_chart_data(request, patient_id):
     temperature_data = []
     oxygen_saturation_data = []
 
-    for vital in patient_vitals:
+    for ts, heart_rate, temp, spo2 in rows:
         # Convert UTC timestamp to local timezone before formatting
-        local_time = timezone.localtime(vital.timestamp)
-        labels.append(local_time.strftime('%H:%M'))
-        heart_rate_data.append(int(vital.heart_rate) if vital.heart_rate else 0)
-        temperature_data.append(float(vital.temperature) if vital.temperature else 0)
-        oxygen_saturation_data.append(float(vital.oxygen_saturation) if vital.oxygen_saturation else 0)
+        labels.append(timezone.localtime(ts).strftime('%H:%M'))
+        heart_rate_data.append(heart_rate)
+        temperature_data.append(temp)
+        oxygen_saturation_data.append(spo2)
 
     return JsonResponse({
         'labels': labels,
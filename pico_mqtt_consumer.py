@@ -21,7 +21,13 @@ MQTT Topics monitored:
 - ward/heart_rate (pulse oximeter heart rate)
 """
 
+import atexit
+import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
 import django
 import csv
 import paho.mqtt.client as mqtt
@@ -32,23 +38,46 @@ from pathlib import Path
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'health_monitor.settings')
 django.setup()
 
+from django.db import transaction
+
 from data_management.models import WardReading, Ward, PatientVitals, Patient
 
+logger = logging.getLogger(__name__)
+
 # Configuration
 DEFAULT_WARD_ID = 1
 DEFAULT_PATIENT_ID = 2
 
-# MQTT Topics from Pico
-TOPICS = {
-    "ward/temperature_dht": "ward_temp_dht",
-    "ward/temperature_lm35": "ward_temp_lm35",
-    "ward/humidity": "ward_humidity",
-    "ward/sound": "ward_sound",
-    "ward/light": "ward_light",
-    "ward/spo2": "patient_spo2",
-    "ward/heart_rate": "patient_heart_rate"
+# Batching: readings are buffered and flushed in one bulk_create per model
+# inside a single transaction, instead of one INSERT + commit per reading
+BATCH_SIZE = 50
+FLUSH_INTERVAL_S = 2.0
+
+_ward_buf = []
+_vitals_buf = []
+_buf_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+# Hand-off between paho's network thread and the DB/CSV worker: on_message
+# only enqueues, so a slow INSERT or disk write never stalls the receiver
+_work_q = queue.Queue(maxsize=10000)
+_stop_event = threading.Event()
+_dropped_messages = 0
+
+# MQTT Topics from Pico: topic -> (cache key, emoji, unit). One lookup on
+# the message path yields all three instead of three separate dict gets
+TOPIC_META = {
+    "ward/temperature_dht": ("ward_temp_dht", "🌡️", "°C"),
+    "ward/temperature_lm35": ("ward_temp_lm35", "🌡️", "°C"),
+    "ward/humidity": ("ward_humidity", "💧", "%"),
+    "ward/sound": ("ward_sound", "🔊", "dB"),
+    "ward/light": ("ward_light", "💡", "lux"),
+    "ward/spo2": ("patient_spo2", "🫁", "%"),
+    "ward/heart_rate": ("patient_heart_rate", "❤️", "bpm")
 }
 
+TOPICS = {topic: meta[0] for topic, meta in TOPIC_META.items()}
+
 # CSV file configuration
 CSV_DIR = Path("sensor_logs")
 CSV_DIR.mkdir(exist_ok=True)
@@ -62,16 +91,38 @@ WARD_HEADERS = ["timestamp", "dht_temp", "lm35_temp", "humidity", "sound_level",
 PATIENT_HEADERS = ["timestamp", "temperature", "heart_rate", "spo2"]
 RAW_HEADERS = ["timestamp", "topic", "value"]
 
-# Initialize CSV files with headers if they don't exist
+# Persistent CSV handles and writers, opened once in init_csv_files().
+# Each helper used to open/close its file per message; keeping a buffered
+# append handle open removes that per-row syscall overhead entirely.
+_csv_files = {}
+_csv_writers = {}
+
 def init_csv_files():
-    """Initialize CSV files with headers if they don't exist"""
-    for csv_file, headers in [(WARD_CSV, WARD_HEADERS), (PATIENT_CSV, PATIENT_HEADERS), (RAW_CSV, RAW_HEADERS)]:
-        if not csv_file.exists():
-            with open(csv_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(headers)
+    """Create CSV files with headers if needed and open persistent writers"""
+    for name, csv_file, headers in [
+        ("ward", WARD_CSV, WARD_HEADERS),
+        ("patient", PATIENT_CSV, PATIENT_HEADERS),
+        ("raw", RAW_CSV, RAW_HEADERS),
+    ]:
+        write_header = not csv_file.exists()
+        fh = open(csv_file, 'a', newline='', buffering=1 << 16)
+        _csv_files[name] = fh
+        _csv_writers[name] = csv.writer(fh)
+        if write_header:
+            _csv_writers[name].writerow(headers)
             print(f"Created CSV file: {csv_file}")
 
+def close_csv_files():
+    """Flush and close the persistent CSV handles"""
+    for fh in _csv_files.values():
+        try:
+            fh.flush()
+            fh.close()
+        except OSError:
+            pass
+    _csv_files.clear()
+    _csv_writers.clear()
+
 # Sensor data cache
 sensor_cache = {
     "ward_temp_dht": None,
@@ -88,68 +139,106 @@ sensor_cache = {
 def log_to_raw_csv(topic, value):
     """Log all raw sensor data to CSV"""
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(RAW_CSV, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([timestamp, topic, value])
+        # Epoch ns: no datetime construction or strftime on the hot path
+        timestamp = time.time_ns()
+        _csv_writers["raw"].writerow([timestamp, topic, value])
     except Exception as e:
-        print(f"✗ Error writing to raw CSV: {e}")
+        logger.error("Error writing to raw CSV: %s", e)
 
 def log_ward_to_csv():
     """Log ward reading to CSV"""
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(WARD_CSV, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                timestamp,
-                sensor_cache["ward_temp_dht"],
-                sensor_cache["ward_temp_lm35"],
-                sensor_cache["ward_humidity"],
-                sensor_cache["ward_sound"],
-                sensor_cache["ward_light"]
-            ])
-        print(f"Logged ward data to CSV")
+        timestamp = time.time_ns()
+        _csv_writers["ward"].writerow([
+            timestamp,
+            sensor_cache["ward_temp_dht"],
+            sensor_cache["ward_temp_lm35"],
+            sensor_cache["ward_humidity"],
+            sensor_cache["ward_sound"],
+            sensor_cache["ward_light"]
+        ])
+        logger.debug("Logged ward data to CSV")
     except Exception as e:
-        print(f"✗ Error writing ward data to CSV: {e}")
+        logger.error("Error writing ward data to CSV: %s", e)
 
 def log_patient_to_csv():
     """Log patient vitals to CSV"""
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = time.time_ns()
         # Use available temperature sensor data
         temp = sensor_cache["ward_temp_dht"] or sensor_cache["ward_temp_lm35"] or 36.5
 
-        with open(PATIENT_CSV, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                timestamp,
-                temp,
-                sensor_cache["patient_heart_rate"],
-                sensor_cache["patient_spo2"]
-            ])
-        print(f"Logged patient vitals to CSV")
+        _csv_writers["patient"].writerow([
+            timestamp,
+            temp,
+            sensor_cache["patient_heart_rate"],
+            sensor_cache["patient_spo2"]
+        ])
+        logger.debug("Logged patient vitals to CSV")
+    except Exception as e:
+        logger.error("Error writing patient data to CSV: %s", e)
+
+def _flush_buffers():
+    """Flush buffered readings to the database in one transaction."""
+    global _last_flush
+    with _buf_lock:
+        ward_rows, _ward_buf[:] = _ward_buf[:], []
+        vitals_rows, _vitals_buf[:] = _vitals_buf[:], []
+        _last_flush = time.monotonic()
+
+    # Push buffered CSV rows to disk on the same cadence as the DB flush
+    for fh in _csv_files.values():
+        try:
+            fh.flush()
+        except OSError:
+            pass
+
+    if not ward_rows and not vitals_rows:
+        return
+    try:
+        with transaction.atomic():
+            if ward_rows:
+                WardReading.objects.bulk_create(ward_rows, batch_size=BATCH_SIZE)
+            if vitals_rows:
+                PatientVitals.objects.bulk_create(vitals_rows, batch_size=BATCH_SIZE)
+        logger.info("Flushed %d ward readings, %d patient vitals", len(ward_rows), len(vitals_rows))
     except Exception as e:
-        print(f"✗ Error writing patient data to CSV: {e}")
+        logger.error("Error flushing buffered readings: %s", e)
+
+def _maybe_flush():
+    """Flush when either buffer is full or the flush interval has elapsed."""
+    with _buf_lock:
+        due = (
+            len(_ward_buf) >= BATCH_SIZE
+            or len(_vitals_buf) >= BATCH_SIZE
+            or (time.monotonic() - _last_flush >= FLUSH_INTERVAL_S
+                and (_ward_buf or _vitals_buf))
+        )
+    if due:
+        _flush_buffers()
 
 def save_ward_reading():
-    """Save ward reading to database when we have sufficient environmental data"""
+    """Buffer a ward reading when we have sufficient environmental data"""
     try:
         # Require at least temperature and humidity
         ward_temp = sensor_cache["ward_temp_dht"] or sensor_cache["ward_temp_lm35"]
 
         if ward_temp is not None and sensor_cache["ward_humidity"] is not None:
-            ward = Ward.objects.get(id=DEFAULT_WARD_ID)
-
-            reading = WardReading.objects.create(
-                ward=ward,
+            reading = WardReading(
+                ward_id=DEFAULT_WARD_ID,
                 temperature=ward_temp,
                 humidity=sensor_cache["ward_humidity"],
                 noise_level=sensor_cache["ward_sound"] or 0.0,
                 light_intensity=sensor_cache["ward_light"]
             )
+            with _buf_lock:
+                _ward_buf.append(reading)
 
-            print(f"Saved ward reading #{reading.id}: T={ward_temp}°C, H={sensor_cache['ward_humidity']}%, Sound={sensor_cache['ward_sound']}, Light={sensor_cache['ward_light']}")
+            logger.debug(
+                "Buffered ward reading: T=%s°C, H=%s%%, Sound=%s, Light=%s",
+                ward_temp, sensor_cache['ward_humidity'],
+                sensor_cache['ward_sound'], sensor_cache['ward_light'],
+            )
 
             # Log to CSV
             log_ward_to_csv()
@@ -162,30 +251,32 @@ def save_ward_reading():
             sensor_cache["ward_light"] = None
             sensor_cache["last_ward_save"] = datetime.now()
 
-    except Ward.DoesNotExist:
-        print(f"✗ Ward with ID {DEFAULT_WARD_ID} not found. Please create a ward in the admin panel.")
     except Exception as e:
-        print(f"✗ Error saving ward reading: {e}")
+        logger.error("Error buffering ward reading: %s", e)
 
 def save_patient_vitals():
-    """Save patient vitals to database when we have vital signs data"""
+    """Buffer patient vitals when we have vital signs data"""
     try:
         if (sensor_cache["patient_spo2"] is not None and
             sensor_cache["patient_heart_rate"] is not None):
 
-            patient = Patient.objects.get(user_id=DEFAULT_PATIENT_ID)
-
             # Use most recent temperature reading
             patient_temp = sensor_cache["ward_temp_dht"] or sensor_cache["ward_temp_lm35"] or 36.5
 
-            vitals = PatientVitals.objects.create(
-                patient=patient,
+            vitals = PatientVitals(
+                patient_id=DEFAULT_PATIENT_ID,
                 temperature=patient_temp,
                 heart_rate=int(sensor_cache["patient_heart_rate"]),
                 oxygen_saturation=sensor_cache["patient_spo2"]
             )
+            with _buf_lock:
+                _vitals_buf.append(vitals)
 
-            print(f"Saved patient vitals #{vitals.id}: T={patient_temp}°C, HR={sensor_cache['patient_heart_rate']}bpm, SpO2={sensor_cache['patient_spo2']}%")
+            logger.debug(
+                "Buffered patient vitals: T=%s°C, HR=%sbpm, SpO2=%s%%",
+                patient_temp, sensor_cache['patient_heart_rate'],
+                sensor_cache['patient_spo2'],
+            )
 
             # Log to CSV
             log_patient_to_csv()
@@ -195,36 +286,18 @@ def save_patient_vitals():
             sensor_cache["patient_heart_rate"] = None
             sensor_cache["last_patient_save"] = datetime.now()
 
-    except Patient.DoesNotExist:
-        print(f"✗ Patient with user_id {DEFAULT_PATIENT_ID} not found. Please create a patient in the admin panel.")
     except Exception as e:
-        print(f"✗ Error saving patient vitals: {e}")
+        logger.error("Error buffering patient vitals: %s", e)
 
 def get_sensor_emoji(topic):
     """Get appropriate emoji for sensor type"""
-    emoji_map = {
-        "ward/temperature_dht": "🌡️",
-        "ward/temperature_lm35": "🌡️",
-        "ward/humidity": "💧",
-        "ward/sound": "🔊",
-        "ward/light": "💡",
-        "ward/spo2": "🫁",
-        "ward/heart_rate": "❤️"
-    }
-    return emoji_map.get(topic, "📊")
+    meta = TOPIC_META.get(topic)
+    return meta[1] if meta else "📊"
 
 def get_sensor_unit(topic):
     """Get appropriate unit for sensor type"""
-    unit_map = {
-        "ward/temperature_dht": "°C",
-        "ward/temperature_lm35": "°C",
-        "ward/humidity": "%",
-        "ward/sound": "dB",
-        "ward/light": "lux",
-        "ward/spo2": "%",
-        "ward/heart_rate": "bpm"
-    }
-    return unit_map.get(topic, "")
+    meta = TOPIC_META.get(topic)
+    return meta[2] if meta else ""
 
 def on_connect(client, userdata, flags, rc):
     """Callback for when the client connects to the MQTT broker"""
@@ -254,16 +327,32 @@ def on_disconnect(client, userdata, rc):
 def on_message(client, userdata, msg):
     """Callback for when a message is received from the MQTT broker"""
     topic = msg.topic
-    payload = msg.payload.decode().strip()
 
-    emoji = get_sensor_emoji(topic)
-    unit = get_sensor_unit(topic)
+    try:
+        # float() accepts bytes (including surrounding whitespace), skipping
+        # the intermediate str allocation
+        value = float(msg.payload)
+    except ValueError:
+        logger.warning("Invalid numeric data from %s: %r", topic, msg.payload)
+        return
 
-    print(f"📡 {emoji} {topic}: {payload}{unit}")
+    meta = TOPIC_META.get(topic)
+    emoji, unit = (meta[1], meta[2]) if meta else ("📊", "")
+    logger.debug("%s %s: %s%s", emoji, topic, value, unit)
 
+    # Hand off to the worker thread; DB and CSV work must not run on
+    # paho's network thread
+    global _dropped_messages
+    try:
+        _work_q.put_nowait((topic, value))
+    except queue.Full:
+        _dropped_messages += 1
+        if _dropped_messages % 100 == 1:
+            logger.warning("Worker queue full, dropped %d messages so far", _dropped_messages)
+
+def _process_reading(topic, value):
+    """Handle one reading on the worker thread: CSV log, cache, buffering."""
     try:
-        value = float(payload)
-
         # Log all data to raw CSV
         log_to_raw_csv(topic, value)
 
@@ -272,18 +361,28 @@ def on_message(client, userdata, msg):
             cache_key = TOPICS[topic]
             sensor_cache[cache_key] = value
 
-            # Print formatted sensor reading
-            sensor_name = cache_key.replace('_', ' ').title()
-            print(f"   💾 Cached: {sensor_name} = {value}{unit}")
+            # Log formatted sensor reading
+            logger.debug("Cached: %s = %s", cache_key.replace('_', ' ').title(), value)
 
-        # Attempt to save complete readings
+        # Attempt to buffer complete readings and flush when due
         save_ward_reading()
         save_patient_vitals()
+        _maybe_flush()
 
-    except ValueError:
-        print(f"✗ Invalid numeric data from {topic}: '{payload}'")
     except Exception as e:
-        print(f"✗ Error processing message from {topic}: {e}")
+        logger.error("Error processing message from %s: %s", topic, e)
+
+def _db_worker():
+    """Drain the work queue until asked to stop, flushing on idle ticks."""
+    while not (_stop_event.is_set() and _work_q.empty()):
+        try:
+            topic, value = _work_q.get(timeout=0.5)
+        except queue.Empty:
+            # Idle: make sure a quiet sensor period still flushes on time
+            _maybe_flush()
+            continue
+        _process_reading(topic, value)
+        _work_q.task_done()
 
 def print_cache_status():
     """Print current cache status for debugging"""
@@ -344,16 +443,53 @@ def print_shutdown_stats():
         print("   Last Patient Save: None")
     print("-" * 40)
 
+def check_target_rows():
+    """Fail fast if the hardcoded Ward/Patient rows are missing.
+
+    Readings are built with ward_id/patient_id directly, so nothing on the
+    hot path would catch a missing FK row until bulk_create failed.
+    """
+    ok = True
+    if not Ward.objects.filter(id=DEFAULT_WARD_ID).exists():
+        print(f"✗ Ward with ID {DEFAULT_WARD_ID} not found. Please create a ward in the admin panel.")
+        ok = False
+    if not Patient.objects.filter(user_id=DEFAULT_PATIENT_ID).exists():
+        print(f"✗ Patient with user_id {DEFAULT_PATIENT_ID} not found. Please create a patient in the admin panel.")
+        ok = False
+    return ok
+
 def main():
     """Main function to run the MQTT consumer"""
+    # INFO by default so the per-message DEBUG lines are never even
+    # formatted; set LOGLEVEL=DEBUG to see them. Records are buffered in
+    # memory and written out in batches (or immediately on ERROR), so the
+    # worker thread doesn't pay a stream write per record
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logging.basicConfig(
+        level=os.environ.get("LOGLEVEL", "INFO"),
+        handlers=[logging.handlers.MemoryHandler(1024, flushLevel=logging.ERROR, target=stream)],
+    )
+
     print_startup_banner()
 
+    if not check_target_rows():
+        return
+
     # Initialize CSV files
     init_csv_files()
 
+    # Don't lose buffered rows on exit
+    atexit.register(close_csv_files)
+    atexit.register(_flush_buffers)
+
+    # DB/CSV work runs here, off paho's network thread
+    worker = threading.Thread(target=_db_worker, daemon=True)
+    worker.start()
+
     try:
         # Create MQTT client
-        client = mqtt.Client()
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION1)
         client.on_connect = on_connect
         client.on_disconnect = on_disconnect
         client.on_message = on_message
@@ -362,15 +498,24 @@ def main():
         print("🔌 Connecting to MQTT broker...")
         client.connect("127.0.0.1", 1883, 60)
 
-        # Start the MQTT loop
+        # Start the MQTT loop in its own thread and idle here
         print("🔄 Starting MQTT message loop...")
-        client.loop_forever()
+        client.loop_start()
+        while True:
+            time.sleep(1)
 
     except KeyboardInterrupt:
         print("\n⏹️  Shutting down MQTT consumer...")
         print_cache_status()
         print_shutdown_stats()
+        client.loop_stop()
         client.disconnect()
+        # Let the worker drain the queue, then flush what's left
+        _stop_event.set()
+        worker.join(timeout=10)
+        _flush_buffers()
+        if _dropped_messages:
+            print(f"⚠️  Dropped {_dropped_messages} messages due to a full worker queue")
         print("✅ Health Monitor MQTT Consumer stopped successfully")
 
     except ConnectionRefusedError: